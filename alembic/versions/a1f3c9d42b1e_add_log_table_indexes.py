@@ -0,0 +1,28 @@
+"""Add composite indexes on snore_logs and pump_logs
+
+Revision ID: a1f3c9d42b1e
+Revises:
+Create Date: 2026-08-30 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1f3c9d42b1e'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_snore_logs_user_ts', 'snore_logs', ['user_id', 'timestamp'])
+    op.create_index('ix_snore_logs_user_detected', 'snore_logs', ['user_id', 'snore_detected'])
+    op.create_index('ix_pump_logs_user_ts', 'pump_logs', ['activated_by', 'timestamp'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_pump_logs_user_ts', table_name='pump_logs')
+    op.drop_index('ix_snore_logs_user_detected', table_name='snore_logs')
+    op.drop_index('ix_snore_logs_user_ts', table_name='snore_logs')
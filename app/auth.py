@@ -1,17 +1,47 @@
-from datetime import datetime, timedelta
+import asyncio
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from .database import get_db
 from .models import User
+from .schemas import UserResponse
 from .config import settings
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# TTL-LRU cache of validated UserResponse objects, keyed by user id.
+# /auth/me is polled by the frontend, and the user row rarely changes.
+_USER_RESPONSE_TTL = 60.0
+_USER_RESPONSE_MAX = 10000
+_user_response_cache: "OrderedDict[str, tuple]" = OrderedDict()
+
+
+def cached_user_response(user: User) -> UserResponse:
+    """UserResponse.model_validate(user) with a short per-user TTL cache"""
+    key = str(user.id)
+    now = time.monotonic()
+
+    hit = _user_response_cache.get(key)
+    if hit is not None and now - hit[0] < _USER_RESPONSE_TTL:
+        _user_response_cache.move_to_end(key)
+        return hit[1]
+
+    response = UserResponse.model_validate(user)
+    _user_response_cache[key] = (now, response)
+    _user_response_cache.move_to_end(key)
+    while len(_user_response_cache) > _USER_RESPONSE_MAX:
+        _user_response_cache.popitem(last=False)
+    return response
+
 # HTTP Bearer token scheme
 security = HTTPBearer()
 
@@ -26,14 +56,26 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+async def hash_password_async(password: str, executor: Optional[Executor] = None) -> str:
+    """
+    Hash a password in an executor
+
+    Bcrypt takes 100-300ms of pure CPU; running it on the event loop would
+    stall every other request for that long.
+    """
+    return await asyncio.get_running_loop().run_in_executor(
+        executor, hash_password, password
+    )
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
     to_encode = data.copy()
     
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = datetime.now(timezone.utc) + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(hours=settings.JWT_EXPIRATION_HOURS)
+        expire = datetime.now(timezone.utc) + timedelta(hours=settings.JWT_EXPIRATION_HOURS)
     
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
@@ -54,14 +96,14 @@ def decode_access_token(token: str) -> dict:
         )
 
 
-def get_current_user(
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> User:
     """Get the current authenticated user"""
     token = credentials.credentials
     payload = decode_access_token(token)
-    
+
     user_id: str = payload.get("sub")
     if user_id is None:
         raise HTTPException(
@@ -69,24 +111,31 @@ def get_current_user(
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
-    user = db.query(User).filter(User.id == user_id).first()
+
+    result = await db.execute(select(User).where(User.id == user_id))
+    user = result.scalar_one_or_none()
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
+
     return user
 
 
-def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
-    """Authenticate a user by email and password"""
-    user = db.query(User).filter(User.email == email).first()
+async def authenticate_user_async(
+    db: AsyncSession, email: str, password: str, executor: Optional[Executor] = None
+) -> Optional[User]:
+    """Authenticate a user, running the bcrypt verify off the event loop"""
+    result = await db.execute(select(User).where(User.email == email))
+    user = result.scalar_one_or_none()
     if not user:
         return None
-    if not verify_password(password, user.password_hash):
+    valid = await asyncio.get_running_loop().run_in_executor(
+        executor, verify_password, password, user.password_hash
+    )
+    if not valid:
         return None
     return user
 
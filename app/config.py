@@ -1,3 +1,4 @@
+from functools import cached_property
 from pydantic_settings import BaseSettings
 from typing import List
 
@@ -11,6 +12,15 @@ class Settings(BaseSettings):
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRATION_HOURS: int = 24
     
+    # Database pool (defaults sized for ~100 concurrent requests per worker)
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 3600
+
+    # Redis (shared state across uvicorn workers; empty = in-process fallback)
+    REDIS_URL: str = ""
+
     # Raspberry Pi
     RASPI_API_URL: str = "https://flexizantisnore.online"
     RASPI_API_KEY: str = "R7mP4xQ2kH9tF3wB8jT6nY4cV2sL5pA"
@@ -23,8 +33,9 @@ class Settings(BaseSettings):
     # CORS
     CORS_ORIGINS: str = "https://anti-snore-front.vercel.app,http://192.168.1.27:5173"
     
-    @property
+    @cached_property
     def cors_origins_list(self) -> List[str]:
+        # Split once and reuse; this is read on every CORS preflight
         return [origin.strip() for origin in self.CORS_ORIGINS.split(",")]
     
     class Config:
@@ -1,22 +1,29 @@
-from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
 from .config import settings
 
-# Create database engine
-engine = create_engine(settings.DATABASE_URL, echo=settings.DEBUG)
+# Async engine over asyncpg: DB waits yield the event loop instead of
+# parking a threadpool thread per call
+ASYNC_DATABASE_URL = settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    echo=settings.DEBUG,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    # Validate pooled connections before use so stale/killed ones are
+    # replaced instead of surfacing as request errors
+    pool_pre_ping=True,
+)
 
 # Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
 
 # Create base class for models
 Base = declarative_base()
 
-# Dependency to get database session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
+# Dependency to get an async database session
+async def get_db():
+    async with AsyncSessionLocal() as session:
+        yield session
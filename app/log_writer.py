@@ -0,0 +1,106 @@
+import asyncio
+import functools
+import logging
+from typing import Dict, List
+
+from sqlalchemy import insert
+
+from .database import AsyncSessionLocal
+from .models import SnoreLog, PumpLog
+
+logger = logging.getLogger(__name__)
+
+# Flush whichever comes first: the interval elapses or MAX_ROWS pile up.
+# The interval is also the durability window — an entry enqueued just
+# before a crash can be lost, which is acceptable for audit logs.
+FLUSH_INTERVAL = 0.1
+MAX_ROWS = 100
+QUEUE_MAXSIZE = 10000
+
+
+class LogWriter:
+    """
+    Batched writer for SnoreLog/PumpLog rows
+
+    Under continuous recording every 5-second clip costs one INSERT+commit,
+    i.e. one WAL fsync per clip per user. Producers enqueue plain value
+    dicts (non-blocking) and a single background task flushes them as one
+    executemany INSERT per table, cutting commits by up to MAX_ROWS x.
+    """
+
+    __slots__ = ("_queue", "_task")
+
+    def __init__(self):
+        self._queue = asyncio.Queue(maxsize=QUEUE_MAXSIZE)
+        self._task = None
+
+    def start(self):
+        """Start the background flush task (called on app startup)"""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    def enqueue_snore(self, **values) -> bool:
+        """Queue one snore_logs row; returns False if the queue is full"""
+        return self._enqueue(SnoreLog, values)
+
+    def enqueue_pump(self, **values) -> bool:
+        """Queue one pump_logs row; returns False if the queue is full"""
+        return self._enqueue(PumpLog, values)
+
+    def _enqueue(self, model, values: Dict) -> bool:
+        try:
+            self._queue.put_nowait((model, values))
+            return True
+        except asyncio.QueueFull:
+            # Shedding audit rows beats blocking the detection path
+            logger.warning(f"Log queue full; dropping {model.__tablename__} entry")
+            return False
+
+    async def _run(self):
+        """Background task: drain queued rows and flush them in batches"""
+        while True:
+            first = await self._queue.get()
+            # Let entries from concurrent requests accumulate
+            await asyncio.sleep(FLUSH_INTERVAL)
+
+            entries: List[tuple] = [first]
+            while len(entries) < MAX_ROWS and not self._queue.empty():
+                entries.append(self._queue.get_nowait())
+
+            await self._flush(entries)
+
+    async def _flush(self, entries: List[tuple]):
+        """One executemany INSERT per table, all in a single commit"""
+        per_table: Dict = {}
+        for model, values in entries:
+            per_table.setdefault(model, []).append(values)
+
+        try:
+            async with AsyncSessionLocal() as session:
+                for model, rows in per_table.items():
+                    await session.execute(insert(model), rows)
+                await session.commit()
+        except Exception as e:
+            logger.error(f"Failed to flush {len(entries)} log rows: {e}")
+
+    async def aclose(self):
+        """Stop the flush task and write out anything still queued"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        remaining = []
+        while not self._queue.empty():
+            remaining.append(self._queue.get_nowait())
+        if remaining:
+            await self._flush(remaining)
+
+
+@functools.lru_cache(maxsize=1)
+def get_log_writer() -> LogWriter:
+    """Get or create the global log writer instance (thread-safe via lru_cache)"""
+    return LogWriter()
@@ -1,10 +1,18 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
+import concurrent.futures
 import logging
+import os
 from .config import settings
-from .database import engine, Base
+from .database import async_engine, Base
+from .log_writer import get_log_writer
+from .middleware import MicroCacheMiddleware
+from .ml_model import get_detector
+from .raspi_client import get_raspi_client
 from .routers import auth, snore, pump, auto_detect, pillow
+from .routers.auto_detect import AutoDetectStore
+from . import schemas
 
 # Configure logging
 logging.basicConfig(
@@ -13,16 +21,24 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
-
 # Create FastAPI app
 app = FastAPI(
     title="Anti-Snoring Pillow API",
     description="Backend API for snoring detection and pump control",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    # orjson serializes small payloads (and UUID/datetime) much faster
+    # than stdlib json
+    default_response_class=ORJSONResponse
+)
+
+# Short-TTL response cache for the endpoints the frontend polls constantly.
+# Added before CORS so CORS stays outermost and still stamps cached responses.
+app.add_middleware(
+    MicroCacheMiddleware,
+    paths=("/auth/me", "/auto-detect/status"),
+    ttl=2.0,
 )
 
 # Configure CORS
@@ -66,7 +82,7 @@ async def health_check():
 async def global_exception_handler(request: Request, exc: Exception):
     """Global exception handler"""
     logger.error(f"Global exception: {exc}", exc_info=True)
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "message": "Internal server error",
@@ -79,6 +95,48 @@ async def global_exception_handler(request: Request, exc: Exception):
 @app.on_event("startup")
 async def startup_event():
     """Run on application startup"""
+    # Create database tables
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    # Dedicated pool for bcrypt so password hashing never blocks the event loop
+    app.state.pwd_pool = concurrent.futures.ProcessPoolExecutor(max_workers=2)
+
+    # Auto-detect state, scoped to the app (Redis-backed when configured)
+    app.state.auto_detect = AutoDetectStore(settings.REDIS_URL)
+    if not settings.REDIS_URL and int(os.environ.get("WEB_CONCURRENCY", "1")) > 1:
+        # Each worker would hold its own copy of the auto-detect state,
+        # so /auto-detect/status flaps depending on which worker answers
+        logger.warning(
+            "Running multiple workers without REDIS_URL: auto-detect state "
+            "is per-worker and will be inconsistent. Set REDIS_URL."
+        )
+
+    # Background task that batches SnoreLog/PumpLog inserts
+    get_log_writer().start()
+
+    # Warm the singletons so the first real request per worker doesn't pay
+    # the model-load / graph-compilation / client-construction cost
+    get_detector().warmup()
+    get_raspi_client()
+
+    # Pydantic v2 builds validators lazily on first use; force the build
+    # now so no request pays the per-model compile spike
+    for model in (
+        schemas.UserRegister,
+        schemas.UserLogin,
+        schemas.UserResponse,
+        schemas.Token,
+        schemas.SnoreDetectionRequest,
+        schemas.SnoreDetectionResponse,
+        schemas.SnoreLogResponse,
+        schemas.PumpTriggerRequest,
+        schemas.PumpTriggerResponse,
+        schemas.PumpLogResponse,
+        schemas.MessageResponse,
+    ):
+        model.model_rebuild()
+
     logger.info("Starting Anti-Snoring Pillow API")
     logger.info(f"CORS origins: {settings.cors_origins_list}")
     logger.info(f"Raspberry Pi URL: {settings.RASPI_API_URL}")
@@ -88,6 +146,12 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     """Run on application shutdown"""
+    await get_raspi_client().aclose()
+    await app.state.auto_detect.aclose()
+    # Flush any queued log rows before the engine goes away
+    await get_log_writer().aclose()
+    await async_engine.dispose()
+    app.state.pwd_pool.shutdown(wait=False)
     logger.info("Shutting down Anti-Snoring Pillow API")
 
 
@@ -97,6 +161,12 @@ if __name__ == "__main__":
         "app.main:app",
         host=settings.HOST,
         port=settings.PORT,
-        reload=settings.DEBUG
+        reload=settings.DEBUG,
+        # uvloop + httptools: C-level event loop and HTTP parsing
+        loop="uvloop",
+        http="httptools",
+        # reload mode only supports a single worker, and without Redis the
+        # auto-detect store is per-process, so multi-worker needs REDIS_URL
+        workers=1 if (settings.DEBUG or not settings.REDIS_URL) else (os.cpu_count() or 2)
     )
 
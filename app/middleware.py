@@ -0,0 +1,72 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Iterable, List, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class MicroCacheMiddleware:
+    """
+    Tiny ASGI response cache for frequently polled GET endpoints
+
+    The frontend polls /auth/me and /auto-detect/status on every page
+    render, but the underlying data changes rarely per second. Responses
+    are cached for a short TTL keyed on (path, Authorization header hash),
+    turning the steady-state polling path from a DB round-trip into a
+    dict lookup.
+    """
+
+    def __init__(self, app, paths: Iterable[str], ttl: float = 2.0, max_entries: int = 10000):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # key -> (stored_at, status, headers, body), oldest first
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[float, int, List, bytes]]" = OrderedDict()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        auth_header = b""
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                auth_header = value
+                break
+
+        key = (scope["path"], hashlib.sha256(auth_header).hexdigest())
+        now = time.monotonic()
+
+        cached = self._cache.get(key)
+        if cached is not None and now - cached[0] < self.ttl:
+            _, status_code, headers, body = cached
+            await send({
+                "type": "http.response.start",
+                "status": status_code,
+                "headers": headers
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        # Miss: buffer the downstream response while forwarding it
+        captured = {"status": None, "headers": None, "body": bytearray()}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                captured["status"] = message["status"]
+                captured["headers"] = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                captured["body"].extend(message.get("body", b""))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+        # Only cache successful responses; errors should always re-resolve
+        if captured["status"] == 200:
+            self._cache[key] = (now, captured["status"], captured["headers"], bytes(captured["body"]))
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
@@ -1,6 +1,9 @@
+import asyncio
+import functools
+import io
 import numpy as np
 import os
-from typing import Tuple
+from typing import List, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,6 +16,18 @@ except ImportError:
     TENSORFLOW_AVAILABLE = False
     logger.warning("TensorFlow not available. Using mock predictions.")
 
+# Try to import a TFLite interpreter (tflite_runtime is the lightweight
+# standalone package; fall back to the interpreter bundled with TensorFlow)
+try:
+    from tflite_runtime.interpreter import Interpreter as TFLiteInterpreter
+    TFLITE_AVAILABLE = True
+except ImportError:
+    if TENSORFLOW_AVAILABLE:
+        TFLiteInterpreter = tf.lite.Interpreter
+        TFLITE_AVAILABLE = True
+    else:
+        TFLITE_AVAILABLE = False
+
 # Try to import audio processing libraries
 try:
     import librosa
@@ -23,27 +38,142 @@ except ImportError:
     logger.warning("Audio libraries (librosa, soundfile) not available.")
 
 
+# Feature extraction parameters shared by the TF graph and the NumPy fallback
+SAMPLE_RATE = 16000
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MELS = 128
+N_FRAMES = 128
+# Number of PCM samples that makes tf.signal.stft emit exactly N_FRAMES frames
+PCM_SAMPLES = (N_FRAMES - 1) * HOP_LENGTH + N_FFT
+
+# Micro-batching parameters: concurrent predictions arriving within the
+# window are grouped into a single batched model call
+BATCH_WINDOW = 0.01
+MAX_BATCH = 16
+
+# Clips whose RMS falls below this are treated as silence and never reach
+# the STFT/mel/model path (the device records on a timer, so many do)
+SILENCE_RMS_THRESHOLD = 0.001
+
+
+def sniff_audio_format(audio_data: bytes) -> str:
+    """
+    Best-effort container sniff from the leading magic bytes
+
+    The Pi should upload FLAC or Ogg/Opus rather than raw WAV (3-10x less
+    bandwidth on the uplink); libsndfile decodes all of these, so sf.read
+    handles whichever arrives.
+    """
+    if audio_data[:4] == b'RIFF':
+        return 'wav'
+    if audio_data[:4] == b'OggS':
+        return 'ogg'
+    if audio_data[:4] == b'fLaC':
+        return 'flac'
+    return 'unknown'
+
+
+if TENSORFLOW_AVAILABLE:
+    class LogMelgramLayer(tf.keras.layers.Layer):
+        """
+        Log-mel spectrogram extraction as a Keras layer
+
+        Prepending this to the classifier lets STFT, mel projection and
+        normalization run inside a single TF graph (with fused/XLA kernels)
+        instead of a per-request librosa/NumPy pass.
+        """
+
+        def __init__(self, num_mel_bins: int = N_MELS, sample_rate: int = SAMPLE_RATE,
+                     frame_length: int = N_FFT, frame_step: int = HOP_LENGTH, **kwargs):
+            super().__init__(**kwargs)
+            self.num_mel_bins = num_mel_bins
+            self.sample_rate = sample_rate
+            self.frame_length = frame_length
+            self.frame_step = frame_step
+            # Precomputed once; reused by every call
+            self.mel_weight_matrix = tf.signal.linear_to_mel_weight_matrix(
+                num_mel_bins=num_mel_bins,
+                num_spectrogram_bins=frame_length // 2 + 1,
+                sample_rate=sample_rate,
+                lower_edge_hertz=0.0,
+                upper_edge_hertz=sample_rate / 2.0,
+            )
+
+        def call(self, pcm):
+            stfts = tf.signal.stft(
+                pcm,
+                frame_length=self.frame_length,
+                frame_step=self.frame_step,
+                fft_length=self.frame_length,
+            )
+            power = tf.square(tf.abs(stfts))
+            mel = tf.tensordot(power, self.mel_weight_matrix, 1)
+            log_mel = 10.0 * tf.math.log(mel + 1e-6) / tf.math.log(10.0)
+
+            # Per-example normalization (matches the librosa-era preprocessing)
+            mean = tf.reduce_mean(log_mel, axis=[1, 2], keepdims=True)
+            std = tf.math.reduce_std(log_mel, axis=[1, 2], keepdims=True)
+            log_mel = (log_mel - mean) / (std + 1e-8)
+
+            # (batch, frames, mels) -> (batch, mels, frames, 1) for the CNN
+            log_mel = tf.transpose(log_mel, perm=[0, 2, 1])
+            return log_mel[:, :, :, tf.newaxis]
+
+        def get_config(self):
+            config = super().get_config()
+            config.update({
+                "num_mel_bins": self.num_mel_bins,
+                "sample_rate": self.sample_rate,
+                "frame_length": self.frame_length,
+                "frame_step": self.frame_step,
+            })
+            return config
+
+
 class SnoringDetector:
     """Snoring detection model wrapper"""
-    
+
     def __init__(self, model_path: str = "models/snoring_detector.h5"):
         self.model_path = model_path
+        self.tflite_path = os.path.splitext(model_path)[0] + ".tflite"
         self.model = None
         self.is_mock = False
-        
+        self._infer = None  # graph-mode pipeline taking raw float32 PCM
+        self._interpreter = None  # INT8 TFLite interpreter, preferred when present
+        self._inbox = None  # asyncio.Queue, created lazily on the running loop
+        self._batch_task = None
+
+        if AUDIO_LIBS_AVAILABLE:
+            # Precompute the mel filterbank and analysis window once;
+            # librosa.feature.melspectrogram re-derives both on every call
+            self._mel_W = librosa.filters.mel(
+                sr=SAMPLE_RATE, n_fft=N_FFT, n_mels=N_MELS
+            ).astype(np.float32)
+            self._window = librosa.filters.get_window(
+                'hann', N_FFT, fftbins=True
+            ).astype(np.float32)
+
         self._load_model()
-    
+
     def _load_model(self):
-        """Load the TensorFlow model"""
+        """Load the TensorFlow model, preferring the quantized TFLite build"""
+        # INT8 TFLite (see scripts/quantize_model.py): 4x smaller weights
+        # and no full-TF runtime needed at inference time
+        if TFLITE_AVAILABLE and os.path.exists(self.tflite_path):
+            if self._load_tflite():
+                return
+
         if not TENSORFLOW_AVAILABLE:
             logger.warning("TensorFlow not available. Using mock model.")
             self.is_mock = True
             return
-        
+
         if os.path.exists(self.model_path):
             try:
                 self.model = tf.keras.models.load_model(self.model_path)
                 logger.info(f"Model loaded successfully from {self.model_path}")
+                self._build_pipeline()
             except Exception as e:
                 logger.error(f"Failed to load model: {e}")
                 logger.warning("Using mock model instead.")
@@ -51,99 +181,313 @@ class SnoringDetector:
         else:
             logger.warning(f"Model file not found at {self.model_path}. Using mock model.")
             self.is_mock = True
-    
-    def preprocess_audio(self, audio_data: bytes) -> np.ndarray:
+
+    def _load_tflite(self) -> bool:
+        """Load the INT8 TFLite model; returns True on success"""
+        try:
+            self._interpreter = TFLiteInterpreter(
+                model_path=self.tflite_path,
+                num_threads=os.cpu_count()
+            )
+            self._interpreter.allocate_tensors()
+            self._input_detail = self._interpreter.get_input_details()[0]
+            self._output_detail = self._interpreter.get_output_details()[0]
+            logger.info(f"TFLite model loaded successfully from {self.tflite_path}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to load TFLite model: {e}")
+            self._interpreter = None
+            return False
+
+    def _predict_tflite(self, features: np.ndarray) -> float:
+        """Run one inference through the TFLite interpreter"""
+        x = features.astype(np.float32, copy=False)
+        if self._input_detail['dtype'] == np.int8:
+            scale, zero_point = self._input_detail['quantization']
+            x = np.clip(np.round(x / scale + zero_point), -128, 127).astype(np.int8)
+
+        self._interpreter.set_tensor(self._input_detail['index'], x)
+        self._interpreter.invoke()
+        out = self._interpreter.get_tensor(self._output_detail['index'])
+
+        if self._output_detail['dtype'] == np.int8:
+            scale, zero_point = self._output_detail['quantization']
+            out = (out.astype(np.float32) - zero_point) * scale
+        return float(out[0][0])
+
+    def _build_pipeline(self):
+        """
+        Prepend the log-mel layer to the classifier so raw PCM goes through
+        one XLA-compiled graph instead of librosa plus a separate predict call
+        """
+        try:
+            pipeline = tf.keras.Sequential([
+                tf.keras.Input(shape=(PCM_SAMPLES,), dtype=tf.float32),
+                LogMelgramLayer(),
+                self.model,
+            ])
+            self._infer = tf.function(
+                lambda x: pipeline(x, training=False),
+                jit_compile=True
+            )
+            logger.info("Graph-mode preprocessing pipeline built")
+        except Exception as e:
+            logger.warning(f"Could not build graph pipeline: {e}. Falling back to NumPy features.")
+            self._infer = None
+
+    def preprocess_audio(self, audio_data: bytes) -> Tuple[Optional[np.ndarray], float]:
         """
         Preprocess audio data for model input
-        
+
         Args:
-            audio_data: Raw audio bytes (WAV format)
-        
+            audio_data: Raw audio bytes (WAV, FLAC or Ogg/Opus)
+
         Returns:
-            Preprocessed numpy array
+            Tuple of (features, duration_seconds). Features are raw PCM of
+            shape (1, PCM_SAMPLES) when the graph pipeline is available,
+            otherwise mel features of shape (1, 128, 128, 1); None when the
+            clip is silent — callers should skip inference entirely.
+            Duration is measured from the decoded samples, not the byte size.
         """
         if not AUDIO_LIBS_AVAILABLE:
             # Mock preprocessing
-            return np.random.randn(1, 128, 128, 1)
-        
+            return np.random.randn(1, 128, 128, 1), 0.0
+
         try:
-            # Load audio from bytes
-            import io
+            logger.debug(f"Decoding {sniff_audio_format(audio_data)} upload "
+                         f"({len(audio_data)} bytes)")
+
+            # Load audio from bytes; decode straight to float32 so the rest
+            # of the pipeline never touches a float64 buffer
             audio_io = io.BytesIO(audio_data)
-            y, sr = sf.read(audio_io)
-            
-            # Extract mel spectrogram features
-            mel_spec = librosa.feature.melspectrogram(y=y, sr=sr, n_mels=128)
-            mel_spec_db = librosa.power_to_db(mel_spec, ref=np.max)
-            
-            # Normalize
-            mel_spec_db = (mel_spec_db - mel_spec_db.mean()) / mel_spec_db.std()
-            
-            # Reshape for model input (batch_size, height, width, channels)
-            # Assuming model expects (None, 128, 128, 1)
-            if mel_spec_db.shape[1] < 128:
-                # Pad if too short
-                pad_width = 128 - mel_spec_db.shape[1]
-                mel_spec_db = np.pad(mel_spec_db, ((0, 0), (0, pad_width)), mode='constant')
+            y, sr = sf.read(audio_io, dtype='float32', always_2d=False)
+
+            # Downmix to mono and resample to the model's fixed rate
+            if y.ndim > 1:
+                y = y.mean(axis=1)
+            # True clip length, from decoded samples at the original rate
+            duration = float(y.shape[0]) / sr
+            if sr != SAMPLE_RATE:
+                y = librosa.resample(y, orig_sr=sr, target_sr=SAMPLE_RATE)
+
+            # Near-silent clip: skip STFT, mel and the model entirely
+            rms = float(np.sqrt(np.mean(np.square(y), dtype=np.float32)))
+            if rms < SILENCE_RMS_THRESHOLD:
+                logger.debug(f"Silent clip (rms={rms:.5f}); skipping inference")
+                return None, duration
+
+            # Pad/crop the raw PCM up front so the (uncentered) STFT emits
+            # exactly N_FRAMES frames — no mel-level pad/crop afterwards,
+            # and the fixed input shape keeps the tf.function cache warm
+            if y.size < PCM_SAMPLES:
+                y = np.pad(y, (0, PCM_SAMPLES - y.size), mode='constant')
             else:
-                # Crop if too long
-                mel_spec_db = mel_spec_db[:, :128]
-            
-            # Add batch and channel dimensions
-            mel_spec_db = mel_spec_db.reshape(1, 128, 128, 1)
-            
-            return mel_spec_db
-        
+                y = y[:PCM_SAMPLES]
+
+            if self._infer is not None:
+                # Graph path: the TF pipeline does STFT + mel + normalization
+                return y.reshape(1, PCM_SAMPLES), duration
+
+            return self._extract_features_numpy(y), duration
+
         except Exception as e:
             logger.error(f"Error preprocessing audio: {e}")
             # Return mock data on error
-            return np.random.randn(1, 128, 128, 1)
-    
+            return np.random.randn(1, 128, 128, 1), 0.0
+
+    def _extract_features_numpy(self, y: np.ndarray) -> np.ndarray:
+        """
+        NumPy/librosa feature extraction, used when the graph pipeline is
+        unavailable. Expects PCM already padded/cropped to PCM_SAMPLES, so
+        the uncentered STFT yields exactly N_FRAMES frames.
+        """
+        # Extract mel spectrogram features: manual STFT + one matmul against
+        # the filterbank precomputed in __init__
+        S = np.abs(librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH,
+                                window=self._window, center=False))
+        np.square(S, out=S)
+        mel_spec = self._mel_W @ S
+        mel_spec_db = librosa.power_to_db(mel_spec, ref=np.max).astype(np.float32, copy=False)
+
+        # Normalize in place: one subtract pass plus one multiply-by-reciprocal
+        # pass (a single scalar DIV instead of 128x128 of them). The epsilon
+        # keeps flat frames from dividing by zero.
+        m = mel_spec_db.mean(dtype=np.float32)
+        v = mel_spec_db.var(dtype=np.float32)
+        s = np.float32(np.sqrt(v) + 1e-8)
+        np.subtract(mel_spec_db, m, out=mel_spec_db)
+        np.multiply(mel_spec_db, np.float32(1.0) / s, out=mel_spec_db)
+
+        # Already (N_MELS, N_FRAMES) thanks to the fixed-size PCM input;
+        # add batch and channel dimensions (reshape is a view, not a copy)
+        return mel_spec_db.reshape(1, N_MELS, N_FRAMES, 1)
+
     def predict(self, audio_data: bytes) -> Tuple[bool, float]:
         """
         Predict if audio contains snoring
-        
+
         Args:
             audio_data: Raw audio bytes
-        
+
         Returns:
             Tuple of (is_snoring, confidence)
         """
-        if self.is_mock or self.model is None:
+        if self.is_mock or (self.model is None and self._interpreter is None):
             # Mock prediction for testing
             # Generate random prediction with bias towards detecting snoring sometimes
             confidence = np.random.uniform(0.3, 0.95)
             is_snoring = confidence > 0.6
             logger.info(f"Mock prediction: snoring={is_snoring}, confidence={confidence:.2f}")
             return is_snoring, float(confidence)
-        
+
         try:
             # Preprocess audio
-            processed_audio = self.preprocess_audio(audio_data)
-            
-            # Make prediction
-            prediction = self.model.predict(processed_audio, verbose=0)
-            
-            # Extract confidence (assuming binary classification)
-            confidence = float(prediction[0][0])
+            processed_audio, _ = self.preprocess_audio(audio_data)
+            if processed_audio is None:
+                # Silent clip — no snoring by definition
+                return False, 0.0
+
+            # Make prediction (confidence assumes binary classification)
+            if self._interpreter is not None and processed_audio.ndim == 4:
+                confidence = self._predict_tflite(processed_audio)
+            elif self._infer is not None and processed_audio.ndim == 2:
+                confidence = float(self._infer(processed_audio).numpy()[0][0])
+            else:
+                confidence = float(self.model.predict(processed_audio, verbose=0)[0][0])
             is_snoring = confidence > 0.5
-            
+
             logger.info(f"Model prediction: snoring={is_snoring}, confidence={confidence:.2f}")
-            
+
             return is_snoring, confidence
-        
+
         except Exception as e:
             logger.error(f"Error during prediction: {e}")
             # Return safe default on error
             return False, 0.0
-    
+
+    async def predict_async(self, audio_data: bytes) -> Tuple[bool, float, float]:
+        """
+        Async variant of predict that micro-batches concurrent requests
+
+        Predictions arriving within BATCH_WINDOW seconds are grouped into a
+        single batched model call, amortizing the fixed per-call TF dispatch
+        overhead across all inflight requests.
+
+        Args:
+            audio_data: Raw audio bytes
+
+        Returns:
+            Tuple of (is_snoring, confidence, duration_seconds)
+        """
+        if self.is_mock or (self.model is None and self._interpreter is None):
+            is_snoring, confidence = self.predict(audio_data)
+            return is_snoring, confidence, 0.0
+
+        # Decode/STFT are pure CPU work — run them on a worker thread so the
+        # event loop keeps serving other requests during preprocessing
+        processed_audio, duration = await asyncio.to_thread(
+            self.preprocess_audio, audio_data
+        )
+        if processed_audio is None:
+            # Silent clip — no snoring by definition
+            return False, 0.0, duration
+
+        if self._inbox is None:
+            self._inbox = asyncio.Queue()
+            self._batch_task = asyncio.ensure_future(self._batch_loop())
+
+        fut = asyncio.get_running_loop().create_future()
+        await self._inbox.put((processed_audio, fut))
+        is_snoring, confidence = await fut
+        return is_snoring, confidence, duration
+
+    async def _batch_loop(self):
+        """Background task: drain inflight predictions and run one batched inference"""
+        while True:
+            first = await self._inbox.get()
+            # Small window to let concurrent requests pile up
+            await asyncio.sleep(BATCH_WINDOW)
+
+            entries: List[tuple] = [first]
+            while len(entries) < MAX_BATCH and not self._inbox.empty():
+                entries.append(self._inbox.get_nowait())
+
+            try:
+                if self._interpreter is not None:
+                    # TFLite interpreters have a fixed batch dimension of 1,
+                    # so drain the window with one invoke per entry. Each
+                    # invoke runs on a worker thread — this coroutine lives
+                    # on the event loop, and a synchronous forward pass here
+                    # would stall every other endpoint for its duration
+                    for inp, fut in entries:
+                        if not fut.done():
+                            confidence = await asyncio.to_thread(self._predict_tflite, inp)
+                            fut.set_result((confidence > 0.5, confidence))
+                    continue
+
+                # An entry whose shape doesn't match the active pipeline
+                # (e.g. the mock array from a failed decode) must not reach
+                # np.concatenate — that would fail the whole batch and
+                # silently resolve other users' valid requests to (False,
+                # 0.0). Give mismatched entries the safe default directly
+                # and keep the rest of the batch intact.
+                want_ndim = 2 if self._infer is not None else 4
+                mismatched = [e for e in entries if e[0].ndim != want_ndim]
+                entries = [e for e in entries if e[0].ndim == want_ndim]
+                for _, fut in mismatched:
+                    if not fut.done():
+                        fut.set_result((False, 0.0))
+                if not entries:
+                    continue
+
+                batch = np.concatenate([inp for inp, _ in entries], axis=0)
+                # Call the model directly (not .predict) to avoid retracing;
+                # run it on a worker thread to keep the event loop free
+                if self._infer is not None and batch.ndim == 2:
+                    predictions = await asyncio.to_thread(
+                        lambda: self._infer(batch).numpy()
+                    )
+                else:
+                    predictions = await asyncio.to_thread(
+                        lambda: self.model(batch, training=False).numpy()
+                    )
+
+                for (_, fut), row in zip(entries, predictions):
+                    if not fut.done():
+                        confidence = float(row[0])
+                        fut.set_result((confidence > 0.5, confidence))
+            except Exception as e:
+                logger.error(f"Error during batched prediction: {e}")
+                for _, fut in entries:
+                    if not fut.done():
+                        # Same safe default as the sync path
+                        fut.set_result((False, 0.0))
+
+    def warmup(self):
+        """
+        Run one dummy inference so model-load, XLA compilation and kernel
+        dispatch all happen at startup instead of on the first user request
+        """
+        if self.is_mock or (self.model is None and self._interpreter is None):
+            return
+        try:
+            if self._infer is not None:
+                self._infer(np.zeros((1, PCM_SAMPLES), dtype=np.float32))
+            elif self._interpreter is not None:
+                self._predict_tflite(np.zeros((1, N_MELS, N_FRAMES, 1), dtype=np.float32))
+            else:
+                self.model.predict(np.zeros((1, N_MELS, N_FRAMES, 1), dtype=np.float32), verbose=0)
+            logger.info("Model warmup complete")
+        except Exception as e:
+            logger.warning(f"Model warmup failed: {e}")
+
     def predict_from_file(self, audio_path: str) -> Tuple[bool, float]:
         """
         Predict from audio file path
-        
+
         Args:
             audio_path: Path to audio file
-        
+
         Returns:
             Tuple of (is_snoring, confidence)
         """
@@ -156,14 +500,7 @@ class SnoringDetector:
             return False, 0.0
 
 
-# Global model instance
-_detector_instance = None
-
-
+@functools.lru_cache(maxsize=1)
 def get_detector() -> SnoringDetector:
-    """Get or create the global detector instance"""
-    global _detector_instance
-    if _detector_instance is None:
-        _detector_instance = SnoringDetector()
-    return _detector_instance
-
+    """Get or create the global detector instance (lru_cache makes this thread-safe)"""
+    return SnoringDetector()
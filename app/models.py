@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, Float, DateTime, ForeignKey
+from sqlalchemy import Column, String, Boolean, Float, DateTime, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -29,10 +29,17 @@ class SnoreLog(Base):
     snore_detected = Column(Boolean, nullable=False)
     confidence = Column(Float, nullable=False)
     audio_duration = Column(Float, nullable=True)
-    
+
     # Relationship
     user = relationship("User", back_populates="snore_logs")
 
+    # Composite indexes matching the hot queries: logs (per-user ordered by
+    # time) and stats (per-user filtered on snore_detected)
+    __table_args__ = (
+        Index("ix_snore_logs_user_ts", "user_id", "timestamp"),
+        Index("ix_snore_logs_user_detected", "user_id", "snore_detected"),
+    )
+
 
 class PumpLog(Base):
     __tablename__ = "pump_logs"
@@ -46,3 +53,8 @@ class PumpLog(Base):
     # Relationship
     activated_by_user = relationship("User", back_populates="pump_logs")
 
+    # Per-user pump history ordered by time
+    __table_args__ = (
+        Index("ix_pump_logs_user_ts", "activated_by", "timestamp"),
+    )
+
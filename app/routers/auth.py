@@ -1,48 +1,61 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..database import get_db
 from ..models import User
 from ..schemas import UserRegister, UserLogin, Token, UserResponse, MessageResponse
-from ..auth import hash_password, authenticate_user, create_access_token, get_current_user
+from ..auth import (
+    hash_password_async,
+    authenticate_user_async,
+    cached_user_response,
+    create_access_token,
+    get_current_user,
+)
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 
 @router.post("/register", response_model=Token, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserRegister, db: Session = Depends(get_db)):
+async def register(user_data: UserRegister, request: Request, db: AsyncSession = Depends(get_db)):
     """Register a new user"""
-    # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
-    if existing_user:
+    # Hash off the event loop (bcrypt is 100-300ms of pure CPU)
+    password_hash = await hash_password_async(
+        user_data.password, request.app.state.pwd_pool
+    )
+
+    # Single round-trip: the unique index on users.email does the existence
+    # check, closing the race between a separate SELECT and the INSERT
+    stmt = (
+        pg_insert(User)
+        .values(email=user_data.email, password_hash=password_hash)
+        .on_conflict_do_nothing(index_elements=['email'])
+        .returning(User.id, User.email, User.created_at)
+    )
+    row = (await db.execute(stmt)).first()
+    if row is None:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
-    
-    # Create new user
-    new_user = User(
-        email=user_data.email,
-        password_hash=hash_password(user_data.password)
-    )
-    
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    
+    await db.commit()
+
     # Create access token
-    access_token = create_access_token(data={"sub": str(new_user.id)})
-    
+    access_token = create_access_token(data={"sub": str(row.id)})
+
     return Token(
         access_token=access_token,
         token_type="bearer",
-        user=UserResponse.model_validate(new_user)
+        user=UserResponse(id=row.id, email=row.email, created_at=row.created_at)
     )
 
 
 @router.post("/login", response_model=Token)
-async def login(user_data: UserLogin, db: Session = Depends(get_db)):
+async def login(user_data: UserLogin, request: Request, db: AsyncSession = Depends(get_db)):
     """Login user"""
-    user = authenticate_user(db, user_data.email, user_data.password)
+    user = await authenticate_user_async(
+        db, user_data.email, user_data.password, request.app.state.pwd_pool
+    )
     
     if not user:
         raise HTTPException(
@@ -53,11 +66,11 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
     
     # Create access token
     access_token = create_access_token(data={"sub": str(user.id)})
-    
+
     return Token(
         access_token=access_token,
         token_type="bearer",
-        user=UserResponse.model_validate(user)
+        user=cached_user_response(user)
     )
 
 
@@ -77,5 +90,5 @@ async def logout(current_user: User = Depends(get_current_user)):
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(current_user: User = Depends(get_current_user)):
     """Get current user information"""
-    return UserResponse.model_validate(current_user)
+    return cached_user_response(current_user)
 
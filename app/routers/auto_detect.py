@@ -1,32 +1,84 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import Dict
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from typing import Dict, Optional
 import logging
 
-from ..database import get_db
-from ..models import User, SnoreLog, PumpLog
+from ..log_writer import get_log_writer
+from ..models import User
 from ..auth import get_current_user
 from ..raspi_client import get_raspi_client
+from .pump import pump_audit
 
 logger = logging.getLogger(__name__)
 
+# Try to import redis
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+    logger.warning("redis not available. Auto-detect state will be in-process only.")
+
 router = APIRouter(prefix="/auto-detect", tags=["Auto Detection"])
 
-# In-Memory State Store for Multiple Users
-# Structure: { "user_id_string": { "is_running": bool, "delay_minutes": int } }
-user_states: Dict[str, Dict] = {}
 
-def get_user_state(user_id: str) -> Dict:
-    """Get or initialize state for a specific user"""
-    if user_id not in user_states:
-        user_states[user_id] = {
-            "is_running": False,
-            "delay_minutes": 5
-        }
-    return user_states[user_id]
+class AutoDetectStore:
+    """
+    Per-user auto-detection state, scoped to the FastAPI app
+    (app.state.auto_detect) instead of a module-level dict.
+
+    Backed by Redis when configured so every uvicorn worker sees the same
+    view (keys: autodetect:<user_id> -> {"is_running", "delay_minutes"});
+    otherwise an in-process dict, valid for a single worker only.
+    """
+
+    __slots__ = ("_redis", "_local")
+
+    def __init__(self, redis_url: str = ""):
+        self._redis = (
+            aioredis.from_url(redis_url, decode_responses=True)
+            if REDIS_AVAILABLE and redis_url
+            else None
+        )
+        self._local: Dict[str, Dict] = {}
+
+    async def get(self, user_id: str) -> Dict:
+        """Get or initialize state for a specific user"""
+        if self._redis is not None:
+            data = await self._redis.hgetall(f"autodetect:{user_id}")
+            return {
+                "is_running": data.get("is_running", "0") == "1",
+                "delay_minutes": int(data.get("delay_minutes", 5))
+            }
+
+        if user_id not in self._local:
+            self._local[user_id] = {
+                "is_running": False,
+                "delay_minutes": 5
+            }
+        return self._local[user_id]
+
+    async def set(self, user_id: str, is_running: bool, delay_minutes: Optional[int] = None):
+        """Persist state for a specific user (single HSET round-trip on Redis)"""
+        if self._redis is not None:
+            mapping = {"is_running": "1" if is_running else "0"}
+            if delay_minutes is not None:
+                mapping["delay_minutes"] = str(delay_minutes)
+            await self._redis.hset(f"autodetect:{user_id}", mapping=mapping)
+            return
+
+        state = await self.get(user_id)
+        state["is_running"] = is_running
+        if delay_minutes is not None:
+            state["delay_minutes"] = delay_minutes
+
+    async def aclose(self):
+        """Release the Redis connection pool (called on app shutdown)"""
+        if self._redis is not None:
+            await self._redis.close()
 
 @router.post("/start")
 async def start_auto_detection(
+    request: Request,
     delay_minutes: int = 5,
     current_user: User = Depends(get_current_user),
 ):
@@ -34,11 +86,8 @@ async def start_auto_detection(
     Start automatic snoring detection for the CURRENT USER.
     """
     user_id = str(current_user.id)
-    state = get_user_state(user_id)
-    
-    state["is_running"] = True
-    state["delay_minutes"] = delay_minutes
-    
+    await request.app.state.auto_detect.set(user_id, is_running=True, delay_minutes=delay_minutes)
+
     logger.info(f"Auto detection ENABLED for user {current_user.email} (ID: {user_id})")
     
     return {
@@ -51,14 +100,13 @@ async def start_auto_detection(
 
 @router.post("/stop")
 async def stop_auto_detection(
+    request: Request,
     current_user: User = Depends(get_current_user)
 ):
     """Stop automatic snoring detection for the CURRENT USER"""
     user_id = str(current_user.id)
-    state = get_user_state(user_id)
-    
-    state["is_running"] = False
-    
+    await request.app.state.auto_detect.set(user_id, is_running=False)
+
     logger.info(f"Auto detection DISABLED by user {current_user.email}")
     
     return {
@@ -70,12 +118,13 @@ async def stop_auto_detection(
 
 @router.get("/status")
 async def get_auto_detection_status(
+    request: Request,
     current_user: User = Depends(get_current_user)
 ):
     """Get status specific to the CURRENT USER"""
     user_id = str(current_user.id)
-    state = get_user_state(user_id)
-    
+    state = await request.app.state.auto_detect.get(user_id)
+
     return {
         "status": "success",
         "is_running": state["is_running"],
@@ -86,51 +135,39 @@ async def get_auto_detection_status(
 @router.post("/simulate-detection")
 async def simulate_snoring_detection(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
 ):
     """
     Simulate snoring detection for the current user
     """
     try:
-        # Log the simulated detection
-        snore_log = SnoreLog(
+        # Log the simulated detection via the batched writer (non-blocking)
+        get_log_writer().enqueue_snore(
             user_id=current_user.id,
             snore_detected=True,
             confidence=0.85,
             audio_duration=5.0
         )
-        db.add(snore_log)
-        db.commit()
-        
+
         logger.info(f"Simulated snoring detected for user {current_user.email}")
-        
+
         # Note: In the Cloud/Client architecture, the Backend usually doesn't trigger the pump directly.
         # However, for simulation testing, if this is running locally, it might try.
         # If running on Render, this might fail if RaspiClient tries to connect to localhost.
         # We'll keep the logic but wrap safely.
-        
+
         pump_response = None
         pump_triggered = False
-        
+
         try:
-            # Only try to trigger if we have a configured client URL (unlikely on Render towards generic client)
-            # But let's assume this endpoint is for testing logic mainly.
             raspi_client = get_raspi_client()
-            pump_response = await raspi_client.trigger_full_sequence()
+            async with pump_audit(current_user.id):
+                pump_response = await raspi_client.trigger_full_sequence()
             pump_triggered = True
-            
-            # Log pump activation
-            pump_log = PumpLog(
-                activated_by=current_user.id,
-                status="success"
-            )
-            db.add(pump_log)
-            db.commit()
-            
+
         except Exception as pump_error:
             logger.warning(f"Simulate: Could not trigger pump directly (Normal on Cloud): {pump_error}")
             # Don't error out the whole request, just note it
-        
+
         return {
             "status": "success",
             "message": "Snoring simulation recorded",
@@ -1,10 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from pydantic import BaseModel
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from pydantic import BaseModel, Field
+from datetime import datetime, timezone
 import logging
+import orjson
 
-from ..database import get_db
 from ..models import User
 from ..auth import get_current_user
 from ..raspi_client import get_raspi_client
@@ -15,7 +14,9 @@ router = APIRouter(prefix="/pillow", tags=["Pillow Control"])
 
 
 class PillowLevelRequest(BaseModel):
-    level: int
+    # Bounds enforced during parsing, so out-of-range values 422 before
+    # the handler runs
+    level: int = Field(..., ge=0, le=3)
 
 
 @router.post("/level")
@@ -32,12 +33,6 @@ async def set_pillow_level(
     - 2: Medium (Inflate 40s)
     - 3: High (Inflate 60s)
     """
-    if request.level not in [0, 1, 2, 3]:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid level. Must be 0, 1, 2, or 3"
-        )
-    
     try:
         raspi_client = get_raspi_client()
         response = await raspi_client.set_pillow_level(request.level)
@@ -50,7 +45,7 @@ async def set_pillow_level(
             "level": request.level,
             "description": response.get('description'),
             "duration": response.get('duration'),
-            "timestamp": datetime.utcnow()
+            "timestamp": datetime.now(timezone.utc)
         }
     
     except Exception as e:
@@ -61,44 +56,54 @@ async def set_pillow_level(
         )
 
 
+# The levels catalogue is static, so serialize it exactly once at import
+# time instead of rebuilding and re-encoding the same dict per request
+_LEVELS_JSON = orjson.dumps({
+    "status": "success",
+    "levels": [
+        {
+            "level": 0,
+            "name": "Flat",
+            "description": "Deflate completely",
+            "pump": 2,
+            "duration": 30,
+            "icon": "⬇️"
+        },
+        {
+            "level": 1,
+            "name": "Low",
+            "description": "Low elevation",
+            "pump": 1,
+            "duration": 25,
+            "icon": "📏"
+        },
+        {
+            "level": 2,
+            "name": "Medium",
+            "description": "Medium elevation",
+            "pump": 1,
+            "duration": 40,
+            "icon": "📐"
+        },
+        {
+            "level": 3,
+            "name": "High",
+            "description": "High elevation",
+            "pump": 1,
+            "duration": 60,
+            "icon": "📊"
+        }
+    ]
+})
+
+
 @router.get("/levels")
 async def get_pillow_levels(current_user: User = Depends(get_current_user)):
     """Get available pillow levels and their descriptions"""
-    return {
-        "status": "success",
-        "levels": [
-            {
-                "level": 0,
-                "name": "Flat",
-                "description": "Deflate completely",
-                "pump": 2,
-                "duration": 30,
-                "icon": "⬇️"
-            },
-            {
-                "level": 1,
-                "name": "Low",
-                "description": "Low elevation",
-                "pump": 1,
-                "duration": 25,
-                "icon": "📏"
-            },
-            {
-                "level": 2,
-                "name": "Medium",
-                "description": "Medium elevation",
-                "pump": 1,
-                "duration": 40,
-                "icon": "📐"
-            },
-            {
-                "level": 3,
-                "name": "High",
-                "description": "High elevation",
-                "pump": 1,
-                "duration": 60,
-                "icon": "📊"
-            }
-        ]
-    }
+    return Response(
+        content=_LEVELS_JSON,
+        media_type="application/json",
+        # Static catalogue: let browsers/proxies cache it for an hour
+        headers={"Cache-Control": "public, max-age=3600"}
+    )
 
@@ -1,8 +1,11 @@
+from contextlib import asynccontextmanager
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from datetime import datetime
+from datetime import datetime, timezone
 from ..database import get_db
+from ..log_writer import get_log_writer
 from ..models import User, PumpLog
 from ..schemas import PumpTriggerRequest, PumpTriggerResponse, PumpLogResponse, MessageResponse
 from ..auth import get_current_user
@@ -14,21 +17,49 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/pump", tags=["Pump Control"])
 
 
+def write_pump_log(user_id, log_status: str, error_message: str = None):
+    """
+    Queue one PumpLog audit row on the batched log writer
+
+    Non-blocking: the row is flushed by the background writer task, so
+    callers never wait on an INSERT or a WAL fsync.
+    """
+    get_log_writer().enqueue_pump(
+        activated_by=user_id,
+        status=log_status,
+        error_message=error_message
+    )
+
+
+@asynccontextmanager
+async def pump_audit(user_id):
+    """
+    Audit one pump attempt: queues exactly one PumpLog row — "success" if
+    the wrapped block completes, "failed" with the error message otherwise.
+    The exception is re-raised so callers keep their own degradation policy.
+    """
+    try:
+        yield
+    except Exception as e:
+        write_pump_log(user_id, "failed", str(e))
+        raise
+    write_pump_log(user_id, "success")
+
+
 # @router.post("/trigger", response_model=PumpTriggerResponse)
 # async def trigger_pump(
 #     request: PumpTriggerRequest = PumpTriggerRequest(),
 #     current_user: User = Depends(get_current_user),
-#     db: Session = Depends(get_db)
+#     db: AsyncSession = Depends(get_db)
 # ):
 @router.post("/trigger", response_model=PumpTriggerResponse)
 async def trigger_pump(
     request: PumpTriggerRequest = PumpTriggerRequest(),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
 ):
     """
     Manually trigger the air pump on Raspberry Pi
-    
+
     This endpoint allows manual testing of the pump
     """
     try:
@@ -40,37 +71,20 @@ async def trigger_pump(
                 # Trigger pump (ส่ง duration ไปให้ Raspberry Pi)
                 # Trigger pump โดยส่ง duration จาก request ไปให้ Raspberry Pi
                 # Trigger pump โดยใช้ duration จาก request
-        response = await raspi_client.trigger_pump_sequence(duration=request.duration)
+        async with pump_audit(current_user.id):
+            response = await raspi_client.trigger_pump_sequence(duration=request.duration)
         logger.info(f"Raspi pump trigger response: {response}")
 
-
-        
-        # Log the pump activation
-        pump_log = PumpLog(
-            activated_by=current_user.id,
-            status="success"
-        )
-        db.add(pump_log)
-        db.commit()
-        
         logger.info(f"Pump manually triggered by user {current_user.email}")
         
         return PumpTriggerResponse(
             status="success",
             message="Pump triggered successfully",
-            timestamp=datetime.utcnow()
+            timestamp=datetime.now(timezone.utc)
         )
     
     except Exception as e:
-        # Log the failed activation
-        pump_log = PumpLog(
-            activated_by=current_user.id,
-            status="failed",
-            error_message=str(e)
-        )
-        db.add(pump_log)
-        db.commit()
-        
+        # Failed activation already logged by pump_audit
         logger.error(f"Failed to trigger pump for user {current_user.email}: {e}")
         
         raise HTTPException(
@@ -84,16 +98,19 @@ async def get_pump_logs(
     limit: int = 50,
     offset: int = 0,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get user's pump activation logs"""
-    logs = db.query(PumpLog).filter(
-        PumpLog.activated_by == current_user.id
-    ).order_by(
-        PumpLog.timestamp.desc()
-    ).limit(limit).offset(offset).all()
-    
-    return [PumpLogResponse.model_validate(log) for log in logs]
+    result = await db.execute(
+        select(PumpLog)
+        .where(PumpLog.activated_by == current_user.id)
+        .order_by(PumpLog.timestamp.desc())
+        .limit(limit)
+        .offset(offset)
+    )
+    # response_model already validates via from_attributes; re-validating
+    # each row here would double the Pydantic work
+    return result.scalars().all()
 
 
 @router.get("/status")
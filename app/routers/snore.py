@@ -1,64 +1,92 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, status, UploadFile, File
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from datetime import datetime
 from ..database import get_db
 from ..models import User, SnoreLog
 from ..schemas import SnoreDetectionResponse, SnoreLogResponse
 from ..auth import get_current_user
+from ..log_writer import get_log_writer
 from ..ml_model import get_detector
 from ..raspi_client import get_raspi_client
+from .pump import pump_audit
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/snore", tags=["Snoring Detection"])
 
+# Hard cap on uploaded clip size; a 5s FLAC/Ogg clip is well under 1MB
+MAX_AUDIO_BYTES = 10 * 1024 * 1024
+
 
 @router.post("/detect", response_model=SnoreDetectionResponse)
 async def detect_snoring(
+    request: Request,
     audio: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
 ):
     """
     Detect snoring from uploaded audio file
-    
-    Accepts audio file (WAV, MP3, etc.)
+
+    Accepts audio file (WAV, FLAC, Ogg/Opus, etc.) — compressed formats are
+    preferred, cutting uplink bandwidth 3-10x versus raw WAV
     Returns detection result and triggers pump if snoring detected
     """
+    # Starlette has already received and spooled the multipart body by the
+    # time the handler runs, so these checks can't stop the upload itself —
+    # their value is rejecting bad requests cheaply, before any decode or
+    # inference work
+    if not (audio.content_type and audio.content_type.startswith('audio/')):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid file type. Please upload an audio file."
+        )
+
+    content_length = int(request.headers.get("content-length", 0))
+    if content_length > MAX_AUDIO_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Audio file too large. Maximum size is {MAX_AUDIO_BYTES // (1024 * 1024)}MB."
+        )
+
     try:
-        # Validate file type
-        if not audio.content_type.startswith('audio/'):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid file type. Please upload an audio file."
-            )
-        
-        # Read audio data
-        audio_data = await audio.read()
-        audio_duration = len(audio_data) / (44100 * 2)  # Rough estimate
-        
-        # Get detector and make prediction
+        # Read out of the spooled upload in chunks, enforcing
+        # MAX_AUDIO_BYTES on the actual bytes read so the cap holds even
+        # when Content-Length lied
+        chunks = bytearray()
+        while chunk := await audio.read(64 * 1024):
+            chunks.extend(chunk)
+            if len(chunks) > MAX_AUDIO_BYTES:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"Audio file too large. Maximum size is {MAX_AUDIO_BYTES // (1024 * 1024)}MB."
+                )
+        audio_data = bytes(chunks)
+
+        # Get detector and make prediction (batched across concurrent
+        # requests); duration comes from the decoded samples, replacing
+        # the old byte-size estimate that assumed uncompressed 44.1kHz WAV
         detector = get_detector()
-        snore_detected, confidence = detector.predict(audio_data)
+        snore_detected, confidence, audio_duration = await detector.predict_async(audio_data)
         
-        # Log the detection
-        snore_log = SnoreLog(
+        # Log the detection via the batched writer — the response is built
+        # from the in-memory values, so the handler never waits on a commit
+        get_log_writer().enqueue_snore(
             user_id=current_user.id,
             snore_detected=snore_detected,
             confidence=confidence,
             audio_duration=audio_duration
         )
-        db.add(snore_log)
-        db.commit()
-        
+
         # Trigger pump if snoring detected
         pump_triggered = False
         if snore_detected and confidence >= 0.75:
             try:
                 raspi_client = get_raspi_client()
-                await raspi_client.trigger_pump_sequence()
+                async with pump_audit(current_user.id):
+                    await raspi_client.trigger_pump_sequence()
                 pump_triggered = True
                 logger.info(f"Pump triggered for user {current_user.email}")
             except Exception as e:
@@ -95,42 +123,38 @@ async def get_snore_logs(
     limit: int = 50,
     offset: int = 0,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get user's snoring detection logs"""
-    logs = db.query(SnoreLog).filter(
-        SnoreLog.user_id == current_user.id
-    ).order_by(
-        SnoreLog.timestamp.desc()
-    ).limit(limit).offset(offset).all()
-    
-    return [SnoreLogResponse.model_validate(log) for log in logs]
+    result = await db.execute(
+        select(SnoreLog)
+        .where(SnoreLog.user_id == current_user.id)
+        .order_by(SnoreLog.timestamp.desc())
+        .limit(limit)
+        .offset(offset)
+    )
+    # response_model already validates via from_attributes; re-validating
+    # each row here would double the Pydantic work
+    return result.scalars().all()
 
 
 @router.get("/stats")
 async def get_snore_stats(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get user's snoring statistics"""
-    total_logs = db.query(SnoreLog).filter(
-        SnoreLog.user_id == current_user.id
-    ).count()
-    
-    snoring_detected = db.query(SnoreLog).filter(
-        SnoreLog.user_id == current_user.id,
-        SnoreLog.snore_detected == True
-    ).count()
-    
-    avg_confidence = db.query(SnoreLog).filter(
-        SnoreLog.user_id == current_user.id,
-        SnoreLog.snore_detected == True
-    ).with_entities(
-        SnoreLog.confidence
-    ).all()
-    
-    avg_conf_value = sum([c[0] for c in avg_confidence]) / len(avg_confidence) if avg_confidence else 0
-    
+    # Single aggregate round-trip: total, snoring count and average
+    # confidence computed by Postgres instead of materializing every row
+    stmt = select(
+        func.count(SnoreLog.id),
+        func.count(case((SnoreLog.snore_detected == True, 1))),
+        func.avg(case((SnoreLog.snore_detected == True, SnoreLog.confidence)))
+    ).where(SnoreLog.user_id == current_user.id)
+
+    total_logs, snoring_detected, avg_confidence = (await db.execute(stmt)).one()
+    avg_conf_value = float(avg_confidence) if avg_confidence is not None else 0
+
     return {
         "total_detections": total_logs,
         "snoring_detected_count": snoring_detected,
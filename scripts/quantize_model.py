@@ -0,0 +1,46 @@
+"""
+Convert the Keras snoring detector to an INT8 TFLite model
+
+Run after (re)training:
+    python scripts/quantize_model.py [models/snoring_detector.h5]
+
+Writes models/snoring_detector.tflite next to the source model. The
+backend prefers the .tflite file when present: INT8 weights are 4x
+smaller than FP32, and tflite_runtime with XNNPACK is much faster than
+full Keras inference on CPU-only hosts like the Raspberry Pi.
+"""
+import os
+import sys
+
+import numpy as np
+import tensorflow as tf
+
+
+def representative_dataset():
+    """Calibration inputs matching the normalized log-mel distribution
+    the model sees in production (zero mean, unit variance)"""
+    for _ in range(100):
+        yield [np.random.randn(1, 128, 128, 1).astype(np.float32)]
+
+
+def main():
+    model_path = sys.argv[1] if len(sys.argv) > 1 else "models/snoring_detector.h5"
+    out_path = os.path.splitext(model_path)[0] + ".tflite"
+
+    model = tf.keras.models.load_model(model_path)
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.int8
+    converter.inference_output_type = tf.int8
+
+    tflite_model = converter.convert()
+    with open(out_path, "wb") as f:
+        f.write(tflite_model)
+    print(f"Wrote {out_path} ({len(tflite_model)} bytes)")
+
+
+if __name__ == "__main__":
+    main()